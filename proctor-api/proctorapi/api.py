@@ -3,35 +3,142 @@ api.py
 - provides the API endpoints for consuming and producing
   REST requests and responses
 """
-from flask import Blueprint, jsonify, request, make_response, current_app, render_template, Response
-from flask_cors import CORS, cross_origin
+from flask import Blueprint, jsonify, request, make_response, current_app, Response, g
 from datetime import datetime, timedelta
-from werkzeug.datastructures import FileStorage
 from urllib3.exceptions import MaxRetryError
 import requests
-from dateutil import parser
-from sqlalchemy import exc, func
+from requests.adapters import HTTPAdapter
+from sqlalchemy import exc, func, and_, or_
 from functools import wraps
 from .models import db, User, Role, UserRoles, Exam, ExamRecording, ExamWarning, required_fields
-from .services.misc import generate_exam_code, confirm_examiner, pre_init_check, InvalidPassphrase, MissingModelFields, datetime_to_str, parse_datetime
+from .services.misc import generate_exam_code, confirm_examiner, pre_init_check, InvalidPassphrase, InvalidRequestArgs, MissingModelFields, datetime_to_str, parse_datetime, TTLCache
 import jwt
 import traceback
-import json
-import math
-from PIL import Image
+import hashlib
 import cv2
-import os
 import numpy
-import pickle
-import face_recognition
+from PIL import Image, ImageOps
 from ftplib import FTP
+from io import BytesIO
 
 api = Blueprint('api', __name__)
 
 ODAPI_URL = 'http://127.0.0.1:5000/'
+# (connect, read) timeouts in seconds for requests to ODAPI
+ODAPI_TIMEOUT = (2, 30)
+
+# Reuses pooled keep-alive connections to ODAPI across requests
+odapi_session = requests.Session()
+odapi_session.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
 
 MAX_WARNING_COUNT = 3
 
+LOGIN_CODE_ATTEMPTS = 3
+
+# Seconds list responses are cached for. Each worker clears its own cache after writes it handles,
+# other workers can serve stale responses until this expires
+RESPONSE_CACHE_TTL = 10
+response_cache = TTLCache(ttl=RESPONSE_CACHE_TTL)
+
+# Results of the per-request role and user checks, reused for a short time
+examiner_cache = TTLCache(ttl=60)
+user_cache = TTLCache(ttl=60)
+
+# Columns list results can be ordered by (with the order_by arg), their defaults and
+# the primary key columns used to break ordering ties when paginating
+ORDER_COLUMNS = {
+    User: {'user_id': User.user_id, 'first_name': User.first_name, 'last_name': User.last_name},
+    Exam: {'start_date': Exam.start_date, 'end_date': Exam.end_date,
+           'exam_name': Exam.exam_name, 'subject_id': Exam.subject_id},
+    ExamRecording: {'time_started': ExamRecording.time_started, 'time_ended': ExamRecording.time_ended},
+    ExamWarning: {'warning_time': ExamWarning.warning_time}
+}
+DEFAULT_ORDER_COLUMNS = {
+    User: User.user_id,
+    Exam: Exam.start_date,
+    ExamRecording: ExamRecording.time_started,
+    ExamWarning: ExamWarning.warning_time
+}
+PRIMARY_KEYS = {
+    User: User.user_id,
+    Exam: Exam.exam_id,
+    ExamRecording: ExamRecording.exam_recording_id,
+    ExamWarning: ExamWarning.exam_warning_id
+}
+
+# Query string args read by get_request_args, as (key, default, arg_type)
+REQUEST_ARGS = (
+    ('user_id', None, int),
+    ('is_examiner', None, int),
+    ('first_name', None, None),
+    ('last_name', None, None),
+    ('exam_warning_id', None, int),
+    ('exam_recording_id', None, int),
+    ('in_progress', None, int),
+    ('exam_id', None, int),
+    ('subject_id', None, int),
+    ('login_code', None, None),
+    ('exam_name', None, None),
+    ('warning_count', None, int),
+    ('min_warnings', None, int),
+    ('max_warnings', None, int),
+    ('period_start', None, None),
+    ('period_end', None, None),
+    ('order_by', 'default', None),
+    ('order', 'desc', None),
+    ('after', None, int),
+    ('page_number', 1, int),
+    ('results_length', 25, int)
+)
+# Args filter_common filters on, by the table their column belongs to
+FILTER_COMMON_ARGS = {
+    User: ('user_id', 'first_name', 'last_name', 'is_examiner'),
+    ExamRecording: ('exam_recording_id',),
+    ExamWarning: ('exam_warning_id',),
+    Exam: ('subject_id', 'exam_name')
+}
+# Args that only order or page results, any other arg in REQUEST_ARGS filters them
+PAGING_ARGS = frozenset(('order_by', 'order', 'after', 'page_number', 'results_length'))
+FILTER_ARGS = frozenset(key for key, default, arg_type in REQUEST_ARGS) - PAGING_ARGS
+
+# Face images are downscaled to fit within this size (width, height) before face detection
+FACE_IMAGE_SIZE = (640, 480)
+FACE_IMAGE_JPEG_QUALITY = 90
+
+def cached_response(f):
+    """
+    Caches successful responses of a GET endpoint, per auth token and query string,
+    and tags them with an ETag so clients sending If-None-Match get a 304 without the body
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # Sorts the query args so the same filters in a different order share an entry
+        key = (f.__name__, request.headers.get('Authorization'), tuple(sorted(request.args.items(multi=True))))
+        cached = response_cache.get(key)
+        if cached is None:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = (body, hashlib.blake2b(body, digest_size=16).hexdigest())
+            response_cache.set(key, cached)
+        else:
+            response = current_app.response_class(cached[0], mimetype='application/json')
+        response.set_etag(cached[1])
+        response.headers['Cache-Control'] = 'private, max-age={}'.format(RESPONSE_CACHE_TTL)
+        return response.make_conditional(request)
+    return decorated
+
+@api.after_request
+def clear_response_cache(response):
+    """
+    Clears this worker's cached responses after any non-GET request, GET requests
+    that write (get_exam_recording) clear it themselves
+    """
+    if request.method != 'GET':
+        response_cache.clear()
+    return response
+
 @api.route('/')
 def index():
     """
@@ -46,8 +153,8 @@ def register():
     Register new users, examiners or examineers
     """
     try:
-        data = request.get_json()
-        pre_init_check(required_fields['user'], **data)
+        data = request.get_json(silent=True) or {}
+        pre_init_check(required_fields['user'], data)
         user = User(**data)
         if data.get('examiner_passphrase'):
             verified_examiner = confirm_examiner(data['examiner_passphrase'])
@@ -77,7 +184,7 @@ def login():
     """
     Login for existing users
     """
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     user = User.authenticate(**data)
 
     if not user:
@@ -91,10 +198,10 @@ def login():
         },
         current_app.config['SECRET_KEY'],
         algorithm='HS256')
-    #print(token)
-    user_id = data['user_id']
-    user = User.query.get(user_id)
-    return jsonify({ 'user': user.to_dict(), 'token': token.decode('UTF-8') }), 200
+    # PyJWT < 2 returns bytes, later versions return str
+    if isinstance(token, bytes):
+        token = token.decode('UTF-8')
+    return jsonify({ 'user': user.to_dict(), 'token': token }), 200
 
 @api.route('/examiner/exam/create', methods=('POST',))
 def create_exam():
@@ -103,28 +210,31 @@ def create_exam():
     """
     try:
         # decode token and check role for access control
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = authenticate_token(request)
         examiner = is_examiner(user_id)
     
         if examiner:
             # Checks if data has required fields - throws exception if not
-            pre_init_check(required_fields['exam'], **data)
-
-            code_found = False
-            while not code_found:
-                # Generates unique exam code until one is found that does not already exist
-                potential_login_code = generate_exam_code()
-                code_exists = Exam.query.filter_by(login_code=potential_login_code).first()
-                if not code_exists:
-                    data['login_code'] = potential_login_code
-                    break
+            pre_init_check(required_fields['exam'], data)
+
+            data['login_code'] = generate_exam_code()
             exam = Exam(**data)
             if exam.start_date > exam.end_date:
                 raise Exception('Exam end_date precedes Exam start_date')
-            db.session.add(exam)
-            db.session.commit()
-            return jsonify(exam.to_dict()), 201
+            for _ in range(LOGIN_CODE_ATTEMPTS):
+                # Relies on the unique constraint on login_code, regenerating the code if it already exists
+                try:
+                    db.session.add(exam)
+                    db.session.commit()
+                    return jsonify(exam.to_dict()), 201
+                except exc.IntegrityError as e:
+                    db.session.rollback()
+                    # Only a login_code collision is retried, any other violation is a real error
+                    if not is_login_code_conflict(e):
+                        raise
+                    exam.login_code = generate_exam_code()
+            raise Exception('Could not generate a unique exam login_code')
         
         return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
     except MissingModelFields as e:
@@ -136,7 +246,54 @@ def create_exam():
         print(traceback.format_exc())
         return jsonify({ 'message': e.args }), 500
 
+@api.route('/examiner/exam/create_bulk', methods=('POST',))
+def create_exams():
+    """
+    Creates multiple exam records, generating their login codes in one batch
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = authenticate_token(request)
+        examiner = is_examiner(user_id)
+
+        if examiner:
+            exams_data = data.get('exams')
+            if not isinstance(exams_data, list) or not exams_data:
+                return jsonify({'message':'No exams list included in payload'}), 400
+            exams = []
+            for exam_data in exams_data:
+                pre_init_check(required_fields['exam'], exam_data)
+                exam = Exam(**{**exam_data, 'login_code':None})
+                if exam.start_date > exam.end_date:
+                    raise Exception('Exam end_date precedes Exam start_date')
+                exams.append(exam)
+            for _ in range(LOGIN_CODE_ATTEMPTS):
+                # Codes are checked against existing exams up front, the unique constraint
+                # still catches any taken by a concurrent request, in which case all are regenerated
+                for exam, login_code in zip(exams, unused_exam_codes(len(exams))):
+                    exam.login_code = login_code
+                try:
+                    db.session.add_all(exams)
+                    db.session.commit()
+                    return jsonify({'exams':[exam.to_dict() for exam in exams]}), 201
+                except exc.IntegrityError as e:
+                    db.session.rollback()
+                    if not is_login_code_conflict(e):
+                        raise
+            raise Exception('Could not generate unique exam login_codes')
+
+        return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
+    except MissingModelFields as e:
+        return jsonify({ 'message': e.args }), 400
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({ 'message': e.args }), 500
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({ 'message': e.args }), 500
+
 @api.route('/examiner/exam', methods=('GET',))
+@cached_response
 def get_exam():
     """
     Gets existing exam records, can be filtered with exam_id and login_code.
@@ -150,12 +307,16 @@ def get_exam():
             # Query to run
             exams = []
             if examiner:
-                results_query = db.session.query(Exam, func.count(ExamRecording.exam_id)).\
-                                outerjoin(ExamRecording, ExamRecording.exam_id==Exam.exam_id).\
-                                group_by(Exam.exam_id)
-                # Filters query results using request params
-                results, next_page_exists = filter_results(results_query, Exam)
-                
+                # Recordings (and users or warnings) are only joined when filtering on them,
+                # otherwise they're counted afterwards for just the exams on this page
+                if filtered_tables(Exam):
+                    results_query = db.session.query(Exam, func.count(func.distinct(ExamRecording.exam_recording_id)))
+                    results_query = join_filtered_tables(results_query, Exam).group_by(Exam.exam_id)
+                    results, next_page_exists = filter_results(results_query, Exam)
+                else:
+                    results, next_page_exists = filter_results(Exam.query, Exam)
+                    er_counts = count_by(ExamRecording.exam_id, [e.exam_id for e in results])
+                    results = [(e, er_counts.get(e.exam_id, 0)) for e in results]
                 for e, er_count in results:
                     exams.append({
                         **e.to_dict(),
@@ -175,6 +336,8 @@ def get_exam():
             return jsonify({'exams':exams, 'next_page_exists': next_page_exists}), 200
 
         return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
+    except InvalidRequestArgs as e:
+        return jsonify({ 'message': e.args }), 400
     except (Exception, exc.SQLAlchemyError) as e:
         return jsonify({ 'message': e.args }), 500
     
@@ -184,7 +347,7 @@ def update_exam():
     Updates an existing exam record, dependent on whether it has already started
     """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = authenticate_token(request)
         examiner = is_examiner(user_id)
 
@@ -267,14 +430,15 @@ def create_exam_recording():
     Creates new exam recording record
     """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = authenticate_token(request)
         user = is_user(user_id)
 
         if user:
-            pre_init_check(required_fields['examrecording'], **data)
+            pre_init_check(required_fields['examrecording'], data)
             # Checks for existing recordings or if exam has already ended - can be overrided to create new recording if authorised
-            existing_recording = ExamRecording.query.filter_by(user_id=data['user_id'], exam_id=data['exam_id']).first()
+            existing_recording = db.session.query(ExamRecording.query.\
+                                    filter_by(user_id=data['user_id'], exam_id=data['exam_id']).exists()).scalar()
             exam = Exam.query.get(data['exam_id'])
             if existing_recording:
                 examiner = User.authenticate(**data)
@@ -311,7 +475,8 @@ def create_exam_recording():
 def get_exam_recording():
     """
     Gets exam recordings, can be filtered by user_id, exam_id
-    Returned results are limited by results_length and page_number.
+    Returned results are limited by results_length and page_number, or by after
+    (the exam_recording_id of the last recording received) to page without an offset.
     """
     try:
         # Users can get their own exam recordings, if they're an examiner they can get all of them
@@ -320,51 +485,68 @@ def get_exam_recording():
         getting_own_results = is_self(user_id)
 
         if examiner or getting_own_results:
-            results_query = db.session.query(User, Exam, ExamRecording, func.count(ExamWarning.exam_recording_id)).\
-                            filter(User.user_id==ExamRecording.user_id).\
-                            filter(Exam.exam_id==ExamRecording.exam_id).\
-                            outerjoin(ExamWarning, ExamWarning.exam_recording_id==ExamRecording.exam_recording_id).\
-                            group_by(ExamRecording.exam_recording_id)
-                            
+            # Selects only the columns returned, rather than full entities
+            columns = (ExamRecording.exam_recording_id, User.user_id, User.first_name, User.last_name,
+                       Exam.exam_id, Exam.exam_name, Exam.login_code, Exam.duration,
+                       Exam.subject_id, Exam.document_link, ExamRecording.time_started,
+                       ExamRecording.time_ended, ExamRecording.video_link)
+            # Warnings are only joined and grouped when filtering on them, otherwise
+            # they're counted afterwards for just the recordings on this page
+            args = get_request_args()
+            filtering_warnings = any(args[arg] for arg in ('exam_warning_id', 'warning_count', 'min_warnings', 'max_warnings'))
+            if filtering_warnings:
+                results_query = db.session.query(*columns, func.count(ExamWarning.exam_recording_id).label('warning_count')).\
+                                select_from(ExamRecording).\
+                                join(User, User.user_id==ExamRecording.user_id).\
+                                join(Exam, Exam.exam_id==ExamRecording.exam_id).\
+                                outerjoin(ExamWarning, ExamWarning.exam_recording_id==ExamRecording.exam_recording_id).\
+                                group_by(ExamRecording.exam_recording_id)
+            else:
+                results_query = db.session.query(*columns).\
+                                select_from(ExamRecording).\
+                                join(User, User.user_id==ExamRecording.user_id).\
+                                join(Exam, Exam.exam_id==ExamRecording.exam_id)
+
             results, next_page_exists = filter_results(results_query, ExamRecording)
+            if not filtering_warnings:
+                warning_counts = count_by(ExamWarning.exam_recording_id, [row.exam_recording_id for row in results])
 
             exam_recordings = []
-            in_progress = request.args.get('in_progress', default=None, type=int)
-            if in_progress is not None: in_progress = in_progress==1
-            for u, e, er, ew_count in results:
+            ended_recordings = []
+            in_progress = args['in_progress']
+            for row in results:
                 updated = False
-                duration = e.duration
+                time_ended = row.time_ended
+                duration = row.duration
                 # If exam recording has not ended (or does not have a time_ended value)
-                if er.time_started is not None and er.time_ended is None:
+                if row.time_started is not None and time_ended is None:
                     # Check if the time now has surpassed the latest possible finish time (recording start time + exam duration)
-                    latest_finish_time = er.time_started + timedelta(hours=duration.hour, minutes=duration.minute)
+                    latest_finish_time = row.time_started + timedelta(hours=duration.hour, minutes=duration.minute)
                     if latest_finish_time <= datetime.utcnow():
                         # If so, set the value to latest possible time
                         updated = True
-                        er.time_ended = latest_finish_time
+                        time_ended = latest_finish_time
+                        ended_recordings.append({'exam_recording_id':row.exam_recording_id, 'time_ended':time_ended})
                 # Check so that when querying by in_progress = 1 / True, we dont include recordings that added time_ended to
                 if not (updated and in_progress):
                     exam_recordings.append({
-                        'exam_recording_id':er.exam_recording_id,
-                        'user_id':u.user_id,
-                        'first_name':u.first_name,
-                        'last_name':u.last_name,
-                        'exam_id':e.exam_id,
-                        'exam_name':e.exam_name,
-                        'login_code':e.login_code,
-                        'duration':e.duration.strftime("%H:%M:%S"),
-                        'subject_id':e.subject_id,
-                        'time_started':datetime_to_str(er.time_started),
-                        'time_ended':datetime_to_str(er.time_ended),
-                        'video_link':er.video_link,
-                        'warning_count':ew_count,
-                        'document_link': e.document_link
+                        **row._asdict(),
+                        **({} if filtering_warnings else {'warning_count':warning_counts.get(row.exam_recording_id, 0)}),
+                        'duration':duration.isoformat(timespec='seconds'),
+                        'time_started':datetime_to_str(row.time_started),
+                        'time_ended':datetime_to_str(time_ended)
                     })
-            db.session.commit()
+            # Only writes back when recordings were ended, otherwise this is a read only request
+            if ended_recordings:
+                db.session.bulk_update_mappings(ExamRecording, ended_recordings)
+                db.session.commit()
+                response_cache.clear()
 
             return jsonify({'exam_recordings':exam_recordings, 'next_page_exists':next_page_exists}), 200
         
         return jsonify({'user_id': user_id, 'message': "access denied, invalid user." }), 403
+    except InvalidRequestArgs as e:
+        return jsonify({ 'message': e.args }), 400
     except (Exception, exc.SQLAlchemyError) as e:
         print(traceback.format_exc())
         return jsonify({ 'message': e.args }), 500
@@ -375,7 +557,7 @@ def update_exam_recording():
     Updates existing exam recording record, limited by the parameter action (end, video_link)
     """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = authenticate_token(request)
         examiner = is_examiner(user_id)
         getting_own_results = is_self(user_id)
@@ -443,17 +625,18 @@ def create_exam_warning():
     Creates new exam warning record
     """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = authenticate_token(request)
         examiner = is_examiner(user_id)
 
         if examiner:
-            pre_init_check(required_fields['examwarning'], **data)
-            prev_warnings = ExamWarning.query.filter_by(exam_recording_id=data['exam_recording_id']).all()
+            pre_init_check(required_fields['examwarning'], data)
+            prev_warning_count = db.session.query(func.count(ExamWarning.exam_warning_id)).\
+                                    filter(ExamWarning.exam_recording_id==data['exam_recording_id']).scalar()
             exam_warning = ExamWarning(**data)
             db.session.add(exam_warning)
             # Checks how many previous warnings for the same exam
-            if len(prev_warnings) == MAX_WARNING_COUNT-1:
+            if prev_warning_count == MAX_WARNING_COUNT-1:
                 # If the new warning reaches the limit, end the exam if still in progress
                 exam_recording = ExamRecording.query.get(data['exam_recording_id'])
                 if exam_recording.time_ended is None:
@@ -461,7 +644,7 @@ def create_exam_warning():
                     # End livestream somehow here
                 
             db.session.commit()
-            return jsonify({**exam_warning.to_dict(), 'warning_count':(len(prev_warnings)+1)}), 201
+            return jsonify({**exam_warning.to_dict(), 'warning_count':(prev_warning_count+1)}), 201
         
         return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
     except MissingModelFields as e:
@@ -473,7 +656,57 @@ def create_exam_warning():
         print(traceback.format_exc())
         return jsonify({ 'message': e.args }), 500
 
+@api.route('/examiner/exam_warning/create_bulk', methods=('POST',))
+def create_exam_warnings():
+    """
+    Creates multiple exam warning records with a single multi-row insert
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = authenticate_token(request)
+        examiner = is_examiner(user_id)
+
+        if examiner:
+            warnings = data.get('exam_warnings')
+            if not isinstance(warnings, list) or not warnings:
+                return jsonify({'message':'No exam_warnings list included in payload'}), 400
+            rows = []
+            for warning in warnings:
+                pre_init_check(required_fields['examwarning'], warning)
+                rows.append({
+                    'exam_recording_id':warning['exam_recording_id'],
+                    'warning_time':parse_datetime(warning['warning_time']),
+                    'description':warning['description']
+                })
+            db.session.execute(ExamWarning.__table__.insert(), rows)
+
+            # Ends recordings still in progress that have now reached the warning limit
+            exam_recording_ids = {row['exam_recording_id'] for row in rows}
+            over_limit = db.session.query(ExamWarning.exam_recording_id).\
+                            filter(ExamWarning.exam_recording_id.in_(exam_recording_ids)).\
+                            group_by(ExamWarning.exam_recording_id).\
+                            having(func.count(ExamWarning.exam_warning_id) >= MAX_WARNING_COUNT).all()
+            if over_limit:
+                ExamRecording.query.\
+                    filter(ExamRecording.exam_recording_id.in_([r.exam_recording_id for r in over_limit])).\
+                    filter(ExamRecording.time_ended.is_(None)).\
+                    update({'time_ended': datetime.utcnow()}, synchronize_session=False)
+
+            db.session.commit()
+            return jsonify({'exam_warnings_created': len(rows)}), 201
+
+        return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
+    except MissingModelFields as e:
+        return jsonify({ 'message': e.args }), 400
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({ 'message': e.args }), 500
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({ 'message': e.args }), 500
+
 @api.route('/examiner/exam_warning', methods=('GET',))
+@cached_response
 def get_exam_warning():
     """
     Gets existing exam warning records, can be filtered with exam_warning_id, exam_recording_id, warning_time.
@@ -484,10 +717,17 @@ def get_exam_warning():
         examiner = is_examiner(user_id)
         getting_own_results = is_self(user_id)
         if examiner or getting_own_results:
-            results_query = db.session.query(User, Exam, ExamRecording, ExamWarning).\
-                        filter(User.user_id==ExamRecording.user_id).\
-                        filter(Exam.exam_id==ExamRecording.exam_id).\
-                        filter(ExamWarning.exam_recording_id==ExamRecording.exam_recording_id).\
+            # Selects only the columns returned, rather than full entities
+            results_query = db.session.query(User.user_id, User.first_name, User.last_name,
+                                             Exam.exam_id, Exam.exam_name, Exam.subject_id,
+                                             ExamRecording.exam_recording_id, ExamRecording.time_started,
+                                             ExamRecording.time_ended, ExamRecording.video_link,
+                                             ExamWarning.exam_warning_id, ExamWarning.warning_time,
+                                             ExamWarning.description).\
+                        select_from(ExamWarning).\
+                        join(ExamRecording, ExamWarning.exam_recording_id==ExamRecording.exam_recording_id).\
+                        join(User, User.user_id==ExamRecording.user_id).\
+                        join(Exam, Exam.exam_id==ExamRecording.exam_id).\
                         filter(User.is_examiner==False)
 
             # Filters results
@@ -495,26 +735,19 @@ def get_exam_warning():
 
             payload = []
             
-            for u, e, er, ew in results:
+            for row in results:
                 payload.append({
-                    'user_id':u.user_id,
-                    'first_name':u.first_name,
-                    'last_name':u.last_name,
-                    'exam_id':e.exam_id,
-                    'exam_name':e.exam_name,
-                    'subject_id':e.subject_id,
-                    'exam_recording_id':er.exam_recording_id,
-                    'time_started':datetime_to_str(er.time_started),
-                    'time_ended':datetime_to_str(er.time_ended),
-                    'video_link':er.video_link,
-                    'exam_warning_id':ew.exam_warning_id,
-                    'warning_time':datetime_to_str(ew.warning_time),
-                    'description':ew.description
+                    **row._asdict(),
+                    'time_started':datetime_to_str(row.time_started),
+                    'time_ended':datetime_to_str(row.time_ended),
+                    'warning_time':datetime_to_str(row.warning_time)
                 })
 
             return jsonify({'exam_warnings':payload, 'next_page_exists':next_page_exists}), 200
         else:
             return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
+    except InvalidRequestArgs as e:
+        return jsonify({ 'message': e.args }), 400
     except (Exception, exc.SQLAlchemyError) as e:
         return jsonify({ 'message': e.args }), 500
 
@@ -524,7 +757,7 @@ def update_exam_warning():
     Updates existing exam warning record.
     """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = authenticate_token(request)
         examiner = is_examiner(user_id)
 
@@ -538,7 +771,7 @@ def update_exam_warning():
                 return jsonify({'message':'Exam warning with id {} not found'.format(exam_warning_id)}), 404
             
             if data.get('description'): exam_warning.description = data['description']
-            if data.get('warning_time'): exam_warning.warning_time = parser.parse(data['warning_time']).replace(tzinfo=None)
+            if data.get('warning_time'): exam_warning.warning_time = parse_datetime(data['warning_time'])
             db.session.commit()
 
             return jsonify(exam_warning.to_dict()), 200
@@ -577,6 +810,7 @@ def delete_exam_warning(exam_warning_id):
         return jsonify({ 'message': e.args }), 500
 
 @api.route('/examiner/examinee', methods=('GET',))
+@cached_response
 def get_examinee():
     """
     Gets existing user records, can be filtered with user_id, first_name and last_name.
@@ -587,20 +821,24 @@ def get_examinee():
         examiner = is_examiner(user_id)
         getting_own_results = is_self(user_id)
         if examiner or getting_own_results:
-            results_query = db.session.query(User, func.count(ExamRecording.user_id)).\
-                            outerjoin(ExamRecording, ExamRecording.user_id==User.user_id).\
-                            group_by(User.user_id)
-
-            results, next_page_exists = filter_results(results_query, User)
-            users = []
-            for u, er_count in results:
-                users.append({
-                    **u.to_dict(),
-                    'exam_recordings':er_count
-                })
+            # Selects only the columns returned, rather than full entities
+            columns = (User.user_id, User.first_name, User.last_name, User.is_examiner)
+            # Recordings (and exams or warnings) are only joined when filtering on them,
+            # otherwise they're counted afterwards for just the users on this page
+            if filtered_tables(User):
+                results_query = db.session.query(*columns, func.count(func.distinct(ExamRecording.exam_recording_id)).label('exam_recordings'))
+                results_query = join_filtered_tables(results_query, User).group_by(User.user_id)
+                results, next_page_exists = filter_results(results_query, User)
+                users = [row._asdict() for row in results]
+            else:
+                results, next_page_exists = filter_results(db.session.query(*columns), User)
+                er_counts = count_by(ExamRecording.user_id, [row.user_id for row in results])
+                users = [{**row._asdict(), 'exam_recordings':er_counts.get(row.user_id, 0)} for row in results]
             return jsonify({'users':users, 'next_page_exists':next_page_exists}), 200
         
         return jsonify({'user_id': user_id, 'message': ['access denied, not examiner']}), 403
+    except InvalidRequestArgs as e:
+        return jsonify({ 'message': e.args }), 400
     except (Exception, exc.SQLAlchemyError) as e:
         print(traceback.format_exc())
         return jsonify({ 'message': e.args }), 500
@@ -622,16 +860,15 @@ def deskcheck():
                 image = request.files['image']
                 files = [('image', image.read())]
                 # Sends request to ODAPI
-                r = requests.post(ODAPI_URL+'detections', files=files)
+                r = odapi_session.post(ODAPI_URL+'detections', files=files, timeout=ODAPI_TIMEOUT)
                 if r.status_code == 200:
-                    # Return json of request to client
-                    data = r.json()
-                    return jsonify(data), 200
+                    # Return json of request to client as is, without decoding and re-encoding it
+                    return Response(r.content, status=200, mimetype='application/json')
                 raise Exception("Unsuccessful attempt to detect objects")
             return jsonify({ 'message': 'No image sent' }), 400
         
         return jsonify({'user_id': user_id, 'message': "access denied, invalid user." }), 403
-    except (MaxRetryError, requests.ConnectionError, requests.ConnectTimeout) as e:
+    except (MaxRetryError, requests.ConnectionError, requests.Timeout) as e:
         return jsonify({ 'message': 'Could not connect to ODAPI.' }), 500
     except Exception as e:
         print(traceback.format_exc())
@@ -651,6 +888,11 @@ def upload_face():
             user_id = request.form["user_id"]
             if not is_user(user_id):
                 return jsonify({'message':['User needs to be registered to upload image']}), 400
+
+            image = request.files["image"]
+            img = cv2.imdecode(numpy.frombuffer(image.read(), numpy.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return jsonify({'message':['Image could not be decoded']}), 400
             
             # Connects to FTP server
             FTP_DOMAIN = current_app.config['FTP_DOMAIN']
@@ -664,8 +906,6 @@ def upload_face():
             if 'images' not in folders:
                 ftp.mkd('images')
 
-            image = request.files["image"]
-            image_name = image.filename
             ftp.cwd('images')
             user_id_str = str(user_id)
             folders = ftp.nlst()
@@ -675,17 +915,12 @@ def upload_face():
                 ftp.mkd(user_id_str)
             ftp.cwd(user_id_str)
 
-            # Saves image locally temporarily before uploading
-            temp_img_name = "{}.jpg".format(user_id)
-            img = Image.open(image)
-            img = img.convert('RGB')
-            img.save(os.path.join(os.getcwd(), temp_img_name))
-            
-            temp_img = open(temp_img_name, 'rb')
-            ftp.storbinary('STOR {}'.format(temp_img_name), temp_img)
-            temp_img.close()
+            # Encodes image in memory and uploads it directly
+            # Stores the image at the size used for face authentication
+            img = fit_face_image(img)
+            _, img_buffer = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), FACE_IMAGE_JPEG_QUALITY])
+            ftp.storbinary('STOR {}.jpg'.format(user_id), BytesIO(img_buffer.tobytes()))
             ftp.quit()
-            os.remove(temp_img_name)
 
             return jsonify({'message':'Face image for user {} uploaded successfully'.format(user_id)}), 200
         
@@ -697,22 +932,23 @@ def upload_face():
 @api.route('/examinee/face_authentication', methods=('POST',))
 def face_authentication():
     try:
-        data = request.get_json()
         user_id = authenticate_token(request)
         user = is_user(user_id)
         
         if user:
             if None in (request.files.get('image'), request.form.get('user_id')):
                 return jsonify({'message':['No user_id / image included in payload']}), 400
+            # Imported on first use as loading dlib's models is slow and memory heavy,
+            # and most workers never serve this endpoint
+            import face_recognition
             image = request.files["image"]
             user_id = request.form["user_id"]
-            image_name = image.filename
-            image.save(os.path.join(os.getcwd(), image_name))
-            image1 = face_recognition.load_image_file(image_name)
+            image1 = load_face_image(image)
             face_local1 = face_recognition.face_locations(image1)
             positive_id = False
             if face_local1:
-                image1_encode = face_recognition.face_encodings(image1, face_local1)[0]
+                # Only the first face is compared, so only it is encoded
+                image1_encode = face_recognition.face_encodings(image1, face_local1[:1])[0]
                 
                 # Connects to FTP server
                 FTP_DOMAIN = current_app.config['FTP_DOMAIN']
@@ -736,21 +972,20 @@ def face_authentication():
                         files = ftp.nlst()
                         if user_id_str+'.jpg' in files:
 
-                            temp_image_name = os.path.join(os.getcwd(), user_id_str+'.jpg')
-                            temp_image = open(temp_image_name, "wb")
-                            ftp.retrbinary('RETR '+ user_id_str+'.jpg', temp_image.write)
-                            temp_image.close()
+                            # Downloads the registered image into memory
+                            registered_image = BytesIO()
+                            ftp.retrbinary('RETR '+ user_id_str+'.jpg', registered_image.write)
+                            registered_image.seek(0)
 
-                            image2 = face_recognition.load_image_file(temp_image_name)
-                            image2_encode = face_recognition.face_encodings(image2) [0]
+                            image2 = load_face_image(registered_image)
+                            face_local2 = face_recognition.face_locations(image2)
+                            image2_encode = face_recognition.face_encodings(image2, face_local2[:1])[0]
 
                             result = face_recognition.compare_faces([image1_encode], image2_encode)
                             positive_id = bool(result[0])
-                            os.remove(temp_image_name)
 
                 ftp.quit()
 
-            os.remove(image_name)
             return jsonify({'user_id': user_id, 'positive_id': positive_id}), 200
         else:
             return jsonify({'user_id': user_id, 'message': ['access denied, invalid user.'] }), 403
@@ -758,51 +993,101 @@ def face_authentication():
         print(traceback.format_exc())
         return jsonify({'message': e.args}), 500
 
+def load_face_image(image_file):
+    """
+    Decodes an image file into an RGB array that fits within FACE_IMAGE_SIZE.
+    JPEGs are decoded at a reduced DCT scale where possible, so full resolution pixels
+    that would be discarded by the resize are never produced. EXIF orientation is applied,
+    matching the cv2.imdecode decoding used when the reference face is uploaded
+    """
+    img = Image.open(image_file)
+    img.draft('RGB', FACE_IMAGE_SIZE)
+    img = ImageOps.exif_transpose(img)
+    return fit_face_image(numpy.asarray(img.convert('RGB')))
+
+def fit_face_image(image_array):
+    """
+    Downscales an image array to fit within FACE_IMAGE_SIZE, keeping its aspect ratio,
+    so face detection cost is bounded regardless of the uploaded resolution
+    """
+    height, width = image_array.shape[:2]
+    scale = min(FACE_IMAGE_SIZE[0]/width, FACE_IMAGE_SIZE[1]/height)
+    if scale >= 1:
+        return image_array
+    new_size = (int(width*scale), int(height*scale))
+    return cv2.resize(image_array, new_size, interpolation=cv2.INTER_AREA)
+
 def get_request_args():
     """
-    Gets various request args
-    """
-    args = {}
-    args['user_id'] = request.args.get('user_id', default=None, type=int)
-    args['is_examiner'] = request.args.get('is_examiner', default=None, type=int)
-    if args['is_examiner'] is not None: args['is_examiner'] = args['is_examiner']==1
-    args['first_name'] = request.args.get('first_name', default=None)
-    args['last_name'] = request.args.get('last_name', default=None)
-
-    args['exam_warning_id'] = request.args.get('exam_warning_id', default=None, type=int)
-    args['exam_recording_id'] = request.args.get('exam_recording_id', default=None, type=int)
-    args['in_progress'] = request.args.get('in_progress', default=None, type=int)
-    if args['in_progress'] is not None: args['in_progress'] = args['in_progress']==1
-    args['exam_id'] = request.args.get('exam_id', default=None, type=int)
-    args['subject_id'] = request.args.get('subject_id', default=None, type=int)
-    args['login_code'] = request.args.get('login_code', default=None)
-    args['exam_name'] = request.args.get('exam_name', default=None)
-
-    args['warning_count'] = request.args.get('warning_count', default=None, type=int)
-    args['min_warnings'] = request.args.get('min_warnings', default=None, type=int)
-    args['max_warnings'] = request.args.get('max_warnings', default=None, type=int)
-
-    args['period_start'] = request.args.get('period_start', default=timedelta(days=10))
-    args['period_end'] = request.args.get('period_end', default=timedelta(days=10))
-    if args['period_start'] == timedelta(days=10): args['period_start'] = None
-    if args['period_end'] == timedelta(days=10): args['period_end'] = None
-    args['order_by'] = request.args.get('order_by', default='default').lower()
-    args['order'] = request.args.get('order', default='desc').lower()
-    
-    args['page_number'] = request.args.get('page_number', default=1, type=int)
-    args['results_length'] = request.args.get('results_length', default=25, type=int)
+    Gets various request args, parsed once per request and kept on flask.g
+    """
+    if 'request_args' in g:
+        return g.request_args
+    args = {key: request.args.get(key, default=default, type=arg_type) for key, default, arg_type in REQUEST_ARGS}
+    # Flags are given as 1 or 0
+    for key in ('is_examiner', 'in_progress'):
+        if args[key] is not None: args[key] = args[key]==1
+
+    for key in ('period_start', 'period_end'):
+        try:
+            args[key] = parse_datetime(args[key] or None)
+        except (ValueError, OverflowError):
+            raise InvalidRequestArgs(key, args[key])
+    args['order_by'] = args['order_by'].lower()
+    args['order'] = args['order'].lower()
+
     if args['page_number'] < 1: args['page_number'] = 1
     if args['results_length'] < 1: args['results_length'] = 1
 
+    g.request_args = args
     return args
 
 def filter_results(results, main_class=None):
     """
     Filters results and orders them - takes in query and main_class to perform specific actions
     """
-    # Gets request parameters/arguments
+    # Gets request parameters/arguments, rejecting unknown orderings before building the query
     args = get_request_args()
-    # Big block of ifs to filter
+    if args['order'] not in ('asc', 'desc'):
+        raise InvalidRequestArgs('order', args['order'])
+    if main_class in ORDER_COLUMNS and args['order_by'] != 'default' and args['order_by'] not in ORDER_COLUMNS[main_class]:
+        raise InvalidRequestArgs('order_by', args['order_by'])
+    seeking = False
+    # Filters shared by every query, then those specific to main_class,
+    # skipped entirely when no filter args were given
+    if not FILTER_ARGS.isdisjoint(request.args):
+        results = filter_common(results, args)
+        if main_class in CLASS_FILTERS:
+            results = CLASS_FILTERS[main_class](results, args)
+
+    if main_class in ORDER_COLUMNS:
+        # Orders by the requested column (or the default), breaking ties on the primary key
+        # so rows don't shift between pages
+        order_column = ORDER_COLUMNS[main_class].get(args['order_by'], DEFAULT_ORDER_COLUMNS[main_class])
+        primary_key = PRIMARY_KEYS[main_class]
+        if args['order'] == 'asc': results = results.order_by(order_column.asc(), primary_key.asc())
+        else: results = results.order_by(order_column.desc(), primary_key.desc())
+
+        # Seeks past the last seen recording instead of using an OFFSET when given one
+        if main_class == ExamRecording and order_column is ExamRecording.time_started and args['after']:
+            results, seeking = seek_exam_recordings(results, args['after'], args['order'])
+
+    # Calculates offset to limit the number of results returned, paginating in SQL
+    # and fetching one extra row to check for a next page
+    offset = 0 if seeking else (args['page_number']-1)*args['results_length']
+    results = results.offset(offset).limit(args['results_length']+1).all()
+    # Determines if next page exists, and deletes last extra row if it does
+    next_page_exists = len(results) == args['results_length']+1
+    if next_page_exists: del results[-1]
+
+    return results, next_page_exists
+    
+def filter_common(results, args):
+    """
+    Filters on user, recording, warning and exam args that apply to any query. Assumes the
+    query already joins the User, ExamRecording, ExamWarning and Exam tables these args filter
+    on, exam and user lists join them with join_filtered_tables
+    """
     if args['user_id']: results = results.filter(User.user_id==args['user_id'])
     if args['first_name']: results = results.filter(User.first_name.ilike('%{}%'.format(args['first_name'])))
     if args['last_name']: results = results.filter(User.last_name.ilike('%{}%'.format(args['last_name'])))
@@ -812,79 +1097,132 @@ def filter_results(results, main_class=None):
     if args['exam_recording_id']: results = results.filter(ExamRecording.exam_recording_id==args['exam_recording_id'])
     if args['subject_id']: results = results.filter(Exam.subject_id==args['subject_id'])
     if args['exam_name']: results = results.filter(Exam.exam_name.ilike('%{}%'.format(args['exam_name'])))
+    return results
 
-    if main_class == ExamWarning:
-        if args['period_start']: results = results.filter(ExamWarning.warning_time >= args['period_start'])
-        if args['period_end']: results = results.filter(ExamWarning.warning_time <= args['period_end'])
-        
-        if args['order_by'] == 'something':
-            pass
-        else:
-            if args['order'] == 'asc': results = results.order_by(ExamWarning.warning_time.asc())
-            else: results = results.order_by(ExamWarning.warning_time.desc())
-
-    elif main_class == ExamRecording:
-        if args['exam_id']: results = results.filter(ExamRecording.exam_id==args['exam_id'])
-        if args['warning_count']: results = results.having(func.count(ExamWarning.exam_recording_id)==args['warning_count'])
-        if args['min_warnings']: results = results.having(func.count(ExamWarning.exam_recording_id)>=args['min_warnings'])
-        if args['max_warnings']: results = results.having(func.count(ExamWarning.exam_recording_id)<=args['max_warnings'])
-        if args['period_start']: results = results.filter(ExamRecording.time_started >= args['period_start'])
-        if args['period_end']: results = results.filter(ExamRecording.time_ended <= args['period_end'])
-        if args['in_progress']==1: results = results.filter(ExamRecording.time_ended == None)
-        elif args['in_progress']==0: results = results.filter(ExamRecording.time_ended < datetime.utcnow())
-        if args['order_by'] == 'time_ended':
-            if args['order'] == 'asc': results = results.order_by(ExamRecording.time_ended.asc())
-            else: results = results.order_by(ExamRecording.time_ended.desc())
-        else:
-            if args['order'] == 'asc': results = results.order_by(ExamRecording.time_started.asc())
-            else: results = results.order_by(ExamRecording.time_started.desc())
-
-    elif main_class == Exam:
-        if args['exam_id']: results = results.filter(Exam.exam_id==args['exam_id'])
-        if args['login_code']: results = results.filter(Exam.login_code.ilike('%{}%'.format(args['login_code'])))
-        if args['period_start']: results = results.filter(Exam.start_date >= args['period_start'])
-        if args['period_end']: results = results.filter(Exam.end_date <= args['period_end'])
-        if args['in_progress'] == 1: results = results.filter(Exam.end_date > datetime.utcnow(), Exam.start_date < datetime.utcnow())
-        elif args['in_progress'] == 0: results = results.filter(Exam.end_date <= datetime.utcnow())
-        if args['order_by'] == 'end_date':
-            if args['order'] == 'asc': results = results.order_by(Exam.end_date.asc())
-            else: results = results.order_by(Exam.start_date.desc())
-        elif args['order_by'] == "exam_name":
-            if args['order'] == 'asc': results = results.order_by(Exam.exam_name.asc())
-            else: results = results.order_by(Exam.exam_name.desc())
-        elif args['order_by'] == "subject_id":
-            if args['order'] == 'asc': results = results.order_by(Exam.subject_id.asc())
-            else: results = results.order_by(Exam.subject_id.desc())
-        else:
-            if args['order'] == 'asc': results = results.order_by(Exam.start_date.asc())
-            else: results = results.order_by(Exam.start_date.desc())
-
-    elif main_class == User:
-        if args['order_by'] == 'first_name':
-            if args['order'] == 'asc': results = results.order_by(User.first_name.asc())
-            else: results = results.order_by(User.first_name.desc())
-        elif args['order_by'] == 'last_name':
-            if args['order'] == 'asc': results = results.order_by(User.last_name.asc())
-            else: results = results.order_by(User.last_name.desc())
-        else:
-            if args['order'] == 'asc': results = results.order_by(User.user_id.asc())
-            else: results = results.order_by(User.user_id.desc())
+def filter_exam_warnings(results, args):
+    """
+    Filters exam warnings by their warning_time period
+    """
+    if args['period_start']: results = results.filter(ExamWarning.warning_time >= args['period_start'])
+    if args['period_end']: results = results.filter(ExamWarning.warning_time <= args['period_end'])
+    return results
 
-    # Calculates offset to limit the number of results returned
-    offset = (args['page_number']-1)*args['results_length']
-    results = results[offset:offset+args['results_length']+1]
-    # Determines if next page exists, and deletes last extra row if it does
-    next_page_exists = len(results) == args['results_length']+1
-    if next_page_exists: del results[-1]
+def filter_exam_recordings(results, args):
+    """
+    Filters exam recordings by exam, warning count, period and whether they're in progress
+    """
+    if args['exam_id']: results = results.filter(ExamRecording.exam_id==args['exam_id'])
+    if args['warning_count']: results = results.having(func.count(ExamWarning.exam_recording_id)==args['warning_count'])
+    if args['min_warnings']: results = results.having(func.count(ExamWarning.exam_recording_id)>=args['min_warnings'])
+    if args['max_warnings']: results = results.having(func.count(ExamWarning.exam_recording_id)<=args['max_warnings'])
+    if args['period_start']: results = results.filter(ExamRecording.time_started >= args['period_start'])
+    if args['period_end']: results = results.filter(ExamRecording.time_ended <= args['period_end'])
+    if args['in_progress']==1: results = results.filter(ExamRecording.time_ended.is_(None))
+    elif args['in_progress']==0: results = results.filter(ExamRecording.time_ended.isnot(None))
+    return results
+
+def filter_exams(results, args):
+    """
+    Filters exams by id, login code, period and whether they're in progress
+    """
+    if args['exam_id']: results = results.filter(Exam.exam_id==args['exam_id'])
+    if args['login_code']: results = results.filter(Exam.login_code.ilike('%{}%'.format(args['login_code'])))
+    if args['period_start']: results = results.filter(Exam.start_date >= args['period_start'])
+    if args['period_end']: results = results.filter(Exam.end_date <= args['period_end'])
+    if args['in_progress'] == 1: results = results.filter(Exam.end_date > datetime.utcnow(), Exam.start_date < datetime.utcnow())
+    elif args['in_progress'] == 0: results = results.filter(Exam.end_date <= datetime.utcnow())
+    return results
+
+# Filters specific to the main class of a query, applied after filter_common
+CLASS_FILTERS = {
+    ExamWarning: filter_exam_warnings,
+    ExamRecording: filter_exam_recordings,
+    Exam: filter_exams
+}
+
+def seek_exam_recordings(results, after_id, order):
+    """
+    Keyset pagination - filters exam recordings ordered by time_started to those after the
+    recording with id after_id, returns the query and whether the seek could be applied
+    """
+    last_time_started = db.session.query(ExamRecording.time_started).\
+                        filter(ExamRecording.exam_recording_id==after_id).scalar()
+    if last_time_started is None:
+        return results, False
+    if order == 'asc':
+        results = results.filter(or_(ExamRecording.time_started > last_time_started,
+                                     and_(ExamRecording.time_started == last_time_started,
+                                          ExamRecording.exam_recording_id > after_id)))
+    else:
+        results = results.filter(or_(ExamRecording.time_started < last_time_started,
+                                     and_(ExamRecording.time_started == last_time_started,
+                                          ExamRecording.exam_recording_id < after_id)))
+    return results, True
+
+def is_login_code_conflict(error):
+    """
+    Checks if an IntegrityError was raised by the unique constraint on exam login codes
+    """
+    return 'login_code' in str(error.orig)
+
+def unused_exam_codes(n):
+    """
+    Generates n distinct login codes not already used by an exam, checking each batch of candidates in one query
+    """
+    codes = set()
+    while len(codes) < n:
+        candidates = {generate_exam_code() for _ in range(n - len(codes))} - codes
+        taken = {login_code for login_code, in db.session.query(Exam.login_code).filter(Exam.login_code.in_(candidates))}
+        codes |= candidates - taken
+    return list(codes)
+
+def filtered_tables(main_class):
+    """
+    Gets the tables other than main_class that the request's filter_common args filter on
+    """
+    args = get_request_args()
+    return {table for table, keys in FILTER_COMMON_ARGS.items()
+            if table is not main_class and any(args[key] is not None for key in keys)}
+
+def join_filtered_tables(results, main_class):
+    """
+    Outer joins exam recordings onto an exam or user query, then whichever of users, exams and
+    warnings the request filters on, so every filter_common predicate has a join path
+    """
+    tables = filtered_tables(main_class)
+    if main_class == Exam:
+        results = results.outerjoin(ExamRecording, ExamRecording.exam_id==Exam.exam_id)
+        if User in tables: results = results.outerjoin(User, User.user_id==ExamRecording.user_id)
+    else:
+        results = results.outerjoin(ExamRecording, ExamRecording.user_id==User.user_id)
+        if Exam in tables: results = results.outerjoin(Exam, Exam.exam_id==ExamRecording.exam_id)
+    if ExamWarning in tables:
+        results = results.outerjoin(ExamWarning, ExamWarning.exam_recording_id==ExamRecording.exam_recording_id)
+    return results
+
+def count_by(column, ids):
+    """
+    Counts rows grouped by column for only the given ids, returns a dict of id to count
+    """
+    if not ids:
+        return {}
+    return dict(db.session.query(column, func.count()).filter(column.in_(ids)).group_by(column).all())
 
-    return results, next_page_exists
-    
 def is_examiner(user_id):
-    role_id = UserRoles.query.filter_by(user_id=user_id).value('role_id')
-    return role_id == 1
+    examiner = examiner_cache.get(user_id)
+    if examiner is None:
+        role_id = UserRoles.query.filter_by(user_id=user_id).value('role_id')
+        examiner = role_id == 1
+        examiner_cache.set(user_id, examiner)
+    return examiner
 
 def is_user(user_id):
-    user = User.query.filter_by(user_id=user_id).first()
+    # Only existing users are cached, so newly registered users are found straight away
+    if user_cache.get(user_id):
+        return True
+    user = User.query.get(user_id)
+    if user is not None:
+        user_cache.set(user_id, True)
     return user is not None
 
 def authenticate_token(request):
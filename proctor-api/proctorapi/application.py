@@ -12,6 +12,10 @@ def create_app(app_name='PROCTOR_API'):
     CORS(app)
     app.config.from_object('proctorapi.config.BaseConfig')
 
+    from proctorapi.services.misc import OrjsonEncoder, OrjsonDecoder
+    app.json_encoder = OrjsonEncoder
+    app.json_decoder = OrjsonDecoder
+
     from proctorapi.api import api
     app.register_blueprint(api, url_prefix="/api")
 
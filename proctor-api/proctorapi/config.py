@@ -25,5 +25,13 @@ class BaseConfig(object):
 
     DEBUG = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Keeps a pool of open connections, checking them before use and recycling them
+    # before MySQL's wait_timeout closes them
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 20,
+        'max_overflow': 10,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
     
     
\ No newline at end of file
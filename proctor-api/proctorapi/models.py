@@ -4,7 +4,6 @@ models.py
 """
 
 from datetime import datetime, timedelta
-from dateutil import parser
 from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.mysql import INTEGER
@@ -12,15 +11,18 @@ from sqlalchemy.orm import relationship
 #from sqlalchemy.ext.declarative import declarative_base
 #from sqlalchemy_imageattach.entity import Image, image_attachment
 from werkzeug.security import generate_password_hash, check_password_hash
-from .services.misc import datetime_to_str, parse_datetime
+from .services.misc import datetime_to_str, parse_datetime, TTLCache
 import jwt
 
 db = SQLAlchemy()
 
-required_fields = {'user':['user_id', 'first_name', 'last_name', 'password'],
-                    'exam':['exam_name', 'subject_id', 'start_date', 'end_date', 'duration'],
-                    'examrecording':['exam_id', 'user_id'],
-                    'examwarning':['exam_recording_id', 'warning_time', 'description']}
+required_fields = {'user':('user_id', 'first_name', 'last_name', 'password'),
+                    'exam':('exam_name', 'subject_id', 'start_date', 'end_date', 'duration'),
+                    'examrecording':('exam_id', 'user_id'),
+                    'examwarning':('exam_recording_id', 'warning_time', 'description')}
+
+# Decoded auth tokens mapped to user_id until the token expires, so repeat requests skip jwt.decode
+token_cache = TTLCache(maxsize=10000)
 
 
 class User(db.Model):
@@ -53,7 +55,7 @@ class User(db.Model):
         if not user_id or not password:
             return None
 
-        user = cls.query.filter_by(user_id=user_id).first()
+        user = cls.query.get(user_id)
         if not user or not check_password_hash(user.password, password):
             return None
 
@@ -66,11 +68,15 @@ class User(db.Model):
         :param auth_token:
         :return: integer|string
         """
+        user_id = token_cache.get(token)
+        if user_id is not None:
+            return user_id
         try:
-            payload = jwt.decode(token, current_app.config['SECRET_KEY'])
-            return payload['sub']
+            payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         except Exception:
             return 'Invalid token. Please log in again.'
+        token_cache.set(token, payload['sub'], expires_at=payload['exp'])
+        return payload['sub']
 
     def to_dict(self):
         return {
@@ -93,11 +99,15 @@ class UserRoles(db.Model):
 
 class Exam(db.Model):
     __tablename__ = 'exams'
+    __table_args__ = (
+        db.Index('ix_exams_subject_id_start_date', 'subject_id', 'start_date'),
+        db.Index('ix_exams_start_date_end_date', 'start_date', 'end_date'),
+    )
     
     exam_id = db.Column(INTEGER(unsigned=True), primary_key=True)
     exam_name = db.Column(db.String(500), nullable=False)
     subject_id = db.Column(db.Integer)
-    login_code = db.Column(db.String(255), nullable=False)
+    login_code = db.Column(db.String(255), nullable=False, unique=True)
     start_date = db.Column(db.DateTime, default=datetime.utcnow)
     end_date = db.Column(db.DateTime, default=datetime.utcnow)
     duration = db.Column(db.Time, default="02:30:00")
@@ -122,12 +132,18 @@ class Exam(db.Model):
             'login_code':self.login_code,
             'start_date':datetime_to_str(self.start_date),
             'end_date':datetime_to_str(self.end_date),
-            'duration':self.duration.strftime("%H:%M:%S"),
+            'duration':self.duration.isoformat(timespec='seconds'),
             'document_link':self.document_link
         }
 
 class ExamRecording(db.Model):
     __tablename__ = 'examRecordings'
+    __table_args__ = (
+        db.Index('ix_examRecordings_time_started', 'time_started'),
+        db.Index('ix_examRecordings_user_id_time_started', 'user_id', 'time_started'),
+        db.Index('ix_examRecordings_user_id_exam_id', 'user_id', 'exam_id'),
+        db.Index('ix_examRecordings_exam_id_time_started', 'exam_id', 'time_started'),
+    )
     
     exam_recording_id = db.Column(INTEGER(unsigned=True), primary_key=True)
     exam_id = db.Column(INTEGER(unsigned=True), db.ForeignKey('exams.exam_id'), nullable=False)
@@ -157,6 +173,10 @@ class ExamRecording(db.Model):
 
 class ExamWarning(db.Model):
     __tablename__ = 'examWarnings'
+    __table_args__ = (
+        db.Index('ix_examWarnings_warning_time', 'warning_time'),
+        db.Index('ix_examWarnings_exam_recording_id_warning_time', 'exam_recording_id', 'warning_time'),
+    )
     
     exam_warning_id = db.Column(INTEGER(unsigned=True), primary_key=True)
     exam_recording_id = db.Column(INTEGER(unsigned=True), db.ForeignKey('examRecordings.exam_recording_id'), nullable=False)
@@ -1,33 +1,44 @@
 import os
 import random
 import string
+import time
 from datetime import datetime
-from dateutil import parser
+from flask.json import JSONEncoder, JSONDecoder
+import orjson
+from threading import Lock
 
 def parse_datetime(input_var):
     if isinstance(input_var, str):
-        return parser.parse(input_var).replace(tzinfo=None)
+        # ISO 8601 strings take the fast path, anything else falls back on dateutil
+        try:
+            return datetime.fromisoformat(input_var.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            from dateutil import parser
+            return parser.parse(input_var).replace(tzinfo=None)
     elif input_var is None:
         return input_var
     return input_var.replace(tzinfo=None)
 
 def datetime_to_str(datetime_obj):
+    # Same output as strftime("%Y-%m-%d %H:%M:%S"), without parsing a format string per call
     if datetime_obj:
-        return datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
+        return datetime_obj.isoformat(sep=' ', timespec='seconds')
     return None
 
 charset = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ!0123456789'
 
-def pre_init_check(required_fields, **kwargs):
-        missing_fields = []
-        for field in required_fields:
-            if not kwargs.get(field):
-                missing_fields.append(field)
-        if len(missing_fields):
-            raise MissingModelFields(missing_fields)
+def pre_init_check(required_fields, data):
+    """
+    Checks the request data has values for all required fields, without copying it
+    """
+    if not isinstance(data, dict):
+        raise MissingModelFields(list(required_fields))
+    missing_fields = [field for field in required_fields if not data.get(field)]
+    if missing_fields:
+        raise MissingModelFields(missing_fields)
 
 def generate_exam_code(allowed_chars=charset, str_size=12):
-    return ''.join(random.choice(allowed_chars) for x in range(str_size))
+    return ''.join(random.choices(allowed_chars, k=str_size))
 
 def confirm_examiner(entered_passphrase):
     try:
@@ -40,10 +51,61 @@ def confirm_examiner(entered_passphrase):
         print(e.args)
         raise
 
+class OrjsonEncoder(JSONEncoder):
+    """
+    JSON encoder for jsonify that serializes with orjson, falling back on Flask's
+    encoder for anything orjson doesn't handle (datetimes are passed through so
+    they keep Flask's format)
+    """
+    def encode(self, o):
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys: option |= orjson.OPT_SORT_KEYS
+        if self.indent: option |= orjson.OPT_INDENT_2
+        return orjson.dumps(o, default=self.default, option=option).decode('utf-8')
+
+class OrjsonDecoder(JSONDecoder):
+    """
+    JSON decoder for request.get_json that parses with orjson, its errors are
+    ValueErrors so get_json(silent=True) still returns None on a malformed body
+    """
+    def decode(self, s):
+        return orjson.loads(s)
+
+class TTLCache(object):
+    """
+    Thread-safe dict whose values expire after ttl seconds (or at a given timestamp),
+    cleared entirely when it reaches maxsize
+    """
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item and item[1] > time.time():
+            return item[0]
+        return default
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self._data.clear()
+            self._data[key] = (value, expires_at or time.time() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
 class InvalidPassphrase(Exception):
     def __init__(self):
         super().__init__("Invalid examiner passphrase")
 
+class InvalidRequestArgs(Exception):
+    def __init__(self, arg, value):
+        super().__init__("Invalid value {} for {}".format(value, arg))
+
 class MissingModelFields(Exception):
     def __init__(self, field):
         super().__init__("The model is missing {} field(s)".format(field))
\ No newline at end of file